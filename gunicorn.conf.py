@@ -0,0 +1,21 @@
+"""
+Gunicorn configuration for the workflow engine.
+
+Workflow definitions and instances live in the memory of a single
+WorkflowService, so the service runs as one worker process instead of
+forked workers (which would each hold their own, diverging copy of the
+data). The API only does in-memory lookups, so a gevent worker serves many
+concurrent connections from that one process.
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5001')}"
+# Deliberately not configurable: hosting platforms often set
+# WEB_CONCURRENCY on their own, and more than one worker would split the
+# in-memory store. Setting it here also keeps gunicorn from reading
+# WEB_CONCURRENCY itself.
+workers = 1
+worker_class = "gevent"
+worker_connections = 1000
+keepalive = 5
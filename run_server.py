@@ -1,13 +1,24 @@
 #!/usr/bin/env python3
+"""
+Run the workflow engine.
+
+By default the app is served by gunicorn using gunicorn.conf.py. Pass
+``--dev`` to use Flask's debug server instead.
+"""
 import os
 import sys
 
-# Add the project root to Python path
-sys.path.insert(0, os.path.dirname(__file__))
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
 
-from src.main import app
+# Add the project root to Python path
+sys.path.insert(0, ROOT_DIR)
 
 if __name__ == '__main__':
-    port = int(os.environ.get('PORT', 5001))
-    app.run(host='0.0.0.0', port=port, debug=True)
+    if '--dev' in sys.argv[1:]:
+        from src.main import app
 
+        port = int(os.environ.get('PORT', 5001))
+        app.run(host='0.0.0.0', port=port, debug=True)
+    else:
+        os.chdir(ROOT_DIR)
+        os.execvp('gunicorn', ['gunicorn', '-c', 'gunicorn.conf.py', 'src.main:app'])
@@ -0,0 +1,14 @@
+"""
+JSON encoding helpers for the workflow engine.
+
+Used where JSON bytes are built outside the Flask JSON provider (the
+service-level response caches and the streamed instance list), with the
+same sorted keys the provider produces.
+"""
+
+import orjson
+
+
+def dumps(obj, option: int = 0) -> bytes:
+    """Serialize data as JSON bytes with sorted keys."""
+    return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS | option)
@@ -1,14 +1,55 @@
+# Patch sockets, threading and time before Flask and friends import them.
+from gevent import monkey
+monkey.patch_all()
+
 import os
 import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
+import orjson
 from flask import Flask, send_from_directory
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+from werkzeug.exceptions import HTTPException
 from src.services.workflow_service import WorkflowService
 
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    JSON provider that encodes and decodes with orjson.
+    
+    Responses are built from plain dicts (the models' to_dict() results),
+    with keys sorted like Flask's default provider.
+    """
+
+    def _options(self, indent: bool = False) -> int:
+        option = orjson.OPT_SORT_KEYS if self.sort_keys else 0
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs) -> str:
+        """Serialize data as JSON to a string."""
+        return orjson.dumps(obj, option=self._options(bool(kwargs.get('indent')))).decode()
+
+    def loads(self, s, **kwargs):
+        """Deserialize data as JSON."""
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        """Serialize the given arguments as a JSON response without a str round-trip."""
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(
+            orjson.dumps(obj, option=self._options(indent) | orjson.OPT_APPEND_NEWLINE),
+            mimetype=self.mimetype
+        )
+
+
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'workflow-engine-secret-key-2024'
+app.json = OrjsonProvider(app)
 
 # Enable CORS for all routes
 CORS(app)
@@ -16,12 +57,22 @@ CORS(app)
 # Initialize the workflow service (in-memory storage)
 workflow_service = WorkflowService()
 
-# Make workflow_service available to routes
-app.workflow_service = workflow_service
-
 # Import and register blueprints after app initialization
-from src.routes.workflow import workflow_bp
-app.register_blueprint(workflow_bp, url_prefix='/api')
+from src.routes.workflow import create_workflow_blueprint, create_error_response
+app.register_blueprint(create_workflow_blueprint(workflow_service), url_prefix='/api')
+
+@app.errorhandler(Exception)
+def handle_exception(e):
+    """Turn any unhandled error into a standard JSON error response."""
+    if isinstance(e, HTTPException):
+        # Keep the exception's own headers (e.g. Allow on a 405), apart
+        # from the HTML Content-Type its default body would use
+        response, status_code = create_error_response(e.description, e.code)
+        for name, value in e.get_headers():
+            if name.lower() != 'content-type':
+                response.headers.add(name, value)
+        return response, status_code
+    return create_error_response(f"Internal server error: {str(e)}", 500)
 
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
@@ -7,18 +7,20 @@ This package contains all data models used by the workflow engine:
 - WorkflowDefinition: Contains states and actions that define a workflow
 - WorkflowInstance: Represents a running instance of a workflow
 - HistoryEntry: Represents an entry in the workflow instance history
+- History: Stores the history entries of a workflow instance
 """
 
 from .state import State
 from .action import Action
 from .workflow_definition import WorkflowDefinition
-from .workflow_instance import WorkflowInstance, HistoryEntry
+from .workflow_instance import WorkflowInstance, HistoryEntry, History
 
 __all__ = [
     'State',
     'Action', 
     'WorkflowDefinition',
     'WorkflowInstance',
-    'HistoryEntry'
+    'HistoryEntry',
+    'History'
 ]
 
@@ -4,11 +4,11 @@ Action model for the workflow engine.
 An Action represents a transition between states in the workflow state machine.
 """
 
-from dataclasses import dataclass
-from typing import List, Optional
+from dataclasses import dataclass, field
+from typing import FrozenSet, Optional
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Action:
     """
     Represents an action (transition) in a workflow definition.
@@ -17,16 +17,17 @@ class Action:
         id: Unique identifier for the action
         name: Human-readable name for the action
         enabled: Whether this action can be executed
-        from_states: List of state IDs from which this action can be triggered
+        from_states: Set of state IDs from which this action can be triggered
         to_state: Target state ID where this action leads
         description: Optional description of the action's purpose
     """
     id: str
     name: str
     enabled: bool = True
-    from_states: List[str] = None
+    from_states: FrozenSet[str] = None
     to_state: str = ""
     description: Optional[str] = None
+    _dict_cache: Optional[dict] = field(default=None, init=False, repr=False, compare=False)
     
     def __post_init__(self):
         """Validate action attributes after initialization."""
@@ -36,25 +37,32 @@ class Action:
             raise ValueError("Action name must be a non-empty string")
         if not self.to_state or not isinstance(self.to_state, str):
             raise ValueError("Action must have a valid target state")
-        if self.from_states is None:
-            self.from_states = []
-        if not isinstance(self.from_states, list):
+        from_states = frozenset() if self.from_states is None else self.from_states
+        if not isinstance(from_states, (list, tuple, set, frozenset)):
             raise ValueError("from_states must be a list")
+        object.__setattr__(self, 'from_states', frozenset(from_states))
     
     def can_execute_from_state(self, state_id: str) -> bool:
         """Check if this action can be executed from the given state."""
         return state_id in self.from_states
     
     def to_dict(self) -> dict:
-        """Convert action to dictionary representation."""
-        return {
-            'id': self.id,
-            'name': self.name,
-            'enabled': self.enabled,
-            'from_states': self.from_states,
-            'to_state': self.to_state,
-            'description': self.description
-        }
+        """
+        Convert action to dictionary representation.
+        
+        The action is immutable, so the result is built once and cached;
+        callers must not modify it.
+        """
+        if self._dict_cache is None:
+            object.__setattr__(self, '_dict_cache', {
+                'id': self.id,
+                'name': self.name,
+                'enabled': self.enabled,
+                'from_states': sorted(self.from_states),
+                'to_state': self.to_state,
+                'description': self.description
+            })
+        return self._dict_cache
     
     @classmethod
     def from_dict(cls, data: dict) -> 'Action':
@@ -4,11 +4,11 @@ State model for the workflow engine.
 A State represents a node in the workflow state machine.
 """
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Optional
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class State:
     """
     Represents a state in a workflow definition.
@@ -27,6 +27,7 @@ class State:
     is_final: bool = False
     enabled: bool = True
     description: Optional[str] = None
+    _dict_cache: Optional[dict] = field(default=None, init=False, repr=False, compare=False)
     
     def __post_init__(self):
         """Validate state attributes after initialization."""
@@ -36,15 +37,22 @@ class State:
             raise ValueError("State name must be a non-empty string")
     
     def to_dict(self) -> dict:
-        """Convert state to dictionary representation."""
-        return {
-            'id': self.id,
-            'name': self.name,
-            'is_initial': self.is_initial,
-            'is_final': self.is_final,
-            'enabled': self.enabled,
-            'description': self.description
-        }
+        """
+        Convert state to dictionary representation.
+        
+        The state is immutable, so the result is built once and cached;
+        callers must not modify it.
+        """
+        if self._dict_cache is None:
+            object.__setattr__(self, '_dict_cache', {
+                'id': self.id,
+                'name': self.name,
+                'is_initial': self.is_initial,
+                'is_final': self.is_final,
+                'enabled': self.enabled,
+                'description': self.description
+            })
+        return self._dict_cache
     
     @classmethod
     def from_dict(cls, data: dict) -> 'State':
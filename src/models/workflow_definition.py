@@ -5,12 +5,12 @@ A WorkflowDefinition contains the states and actions that define a complete work
 """
 
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Set, Tuple
 from src.models.state import State
 from src.models.action import Action
 
 
-@dataclass
+@dataclass(slots=True)
 class WorkflowDefinition:
     """
     Represents a complete workflow definition with states and actions.
@@ -27,6 +27,14 @@ class WorkflowDefinition:
     description: Optional[str] = None
     states: Dict[str, State] = field(default_factory=dict)
     actions: Dict[str, Action] = field(default_factory=dict)
+    _dict_cache: Optional[dict] = field(default=None, init=False, repr=False, compare=False)
+    _actions_by_from_state: Dict[str, List[Action]] = field(default_factory=dict, init=False, repr=False, compare=False)
+    _final_state_ids: Set[str] = field(default_factory=set, init=False, repr=False, compare=False)
+    _initial_state_id: Optional[str] = field(default=None, init=False, repr=False, compare=False)
+    _version: int = field(default=0, init=False, repr=False, compare=False)
+    _transition_table: Optional[Dict[Tuple[str, str], str]] = field(default=None, init=False, repr=False, compare=False)
+    _available_actions: Optional[Dict[str, List[Action]]] = field(default=None, init=False, repr=False, compare=False)
+    _available_action_dicts: Optional[Dict[str, List[dict]]] = field(default=None, init=False, repr=False, compare=False)
     
     def __post_init__(self):
         """Validate workflow definition after initialization."""
@@ -39,18 +47,135 @@ class WorkflowDefinition:
         """Add a state to the workflow definition."""
         if state.id in self.states:
             raise ValueError(f"State with ID '{state.id}' already exists")
+        if state.is_initial and self._initial_state_id is not None:
+            raise ValueError("Workflow must have exactly one initial state, found multiple")
         self.states[state.id] = state
+        if state.is_initial:
+            self._initial_state_id = state.id
+        if state.is_final:
+            self._final_state_ids.add(state.id)
+        self._changed()
     
     def add_action(self, action: Action) -> None:
         """Add an action to the workflow definition."""
         if action.id in self.actions:
             raise ValueError(f"Action with ID '{action.id}' already exists")
         self.actions[action.id] = action
+        for from_state_id in action.from_states:
+            self._actions_by_from_state.setdefault(from_state_id, []).append(action)
+        self._changed()
+    
+    def set_contents(self, states: Dict[str, State], actions: Dict[str, Action]) -> None:
+        """
+        Replace all states and actions at once.
+        
+        Bulk alternative to repeated add_state/add_action calls: the dicts
+        are adopted as-is and the lookup indexes are rebuilt in a single
+        pass. Both dicts must be keyed by the IDs of their values.
+        """
+        initial_state_ids = [state_id for state_id, state in states.items() if state.is_initial]
+        if len(initial_state_ids) > 1:
+            raise ValueError("Workflow must have exactly one initial state, found multiple")
+        
+        actions_by_from_state: Dict[str, List[Action]] = {}
+        for action in actions.values():
+            for from_state_id in action.from_states:
+                actions_by_from_state.setdefault(from_state_id, []).append(action)
+        
+        self.states = states
+        self.actions = actions
+        self._initial_state_id = initial_state_ids[0] if initial_state_ids else None
+        self._final_state_ids = {state_id for state_id, state in states.items() if state.is_final}
+        self._actions_by_from_state = actions_by_from_state
+        self._changed()
+    
+    @property
+    def version(self) -> int:
+        """Counter that increases every time the definition changes."""
+        return self._version
+    
+    def _changed(self) -> None:
+        """Bump the version and drop everything derived from the old contents."""
+        self._version += 1
+        self._dict_cache = None
+        self._transition_table = None
+        self._available_actions = None
+        self._available_action_dicts = None
+    
+    def get_actions_from_state(self, state_id: str) -> List[Action]:
+        """Get the actions that list the given state in their from_states."""
+        return self._actions_by_from_state.get(state_id, [])
+    
+    def is_final_state(self, state_id: str) -> bool:
+        """Check if the given state ID refers to a final state."""
+        return state_id in self._final_state_ids
+    
+    def _build_transitions(self) -> None:
+        """
+        Build the transition table and the available actions per state.
+        
+        Works from the from-state index, so each state only looks at the
+        actions that leave it; final and unknown states are skipped whole.
+        """
+        table = {}
+        available_actions = {}
+        available_action_dicts = {}
+        states = self.states
+        for from_state_id, actions in self._actions_by_from_state.items():
+            if from_state_id not in states or from_state_id in self._final_state_ids:
+                continue
+            executable = [action for action in actions if action.enabled and action.to_state in states]
+            if executable:
+                available_actions[from_state_id] = executable
+                available_action_dicts[from_state_id] = [action.to_dict() for action in executable]
+                for action in executable:
+                    table[(from_state_id, action.id)] = action.to_state
+        self._transition_table = table
+        self._available_actions = available_actions
+        self._available_action_dicts = available_action_dicts
+    
+    def get_transition_table(self) -> Dict[Tuple[str, str], str]:
+        """
+        Get the table of executable transitions.
+        
+        Maps (from_state_id, action_id) to the target state ID for every
+        enabled action leaving a non-final state towards an existing state.
+        Built on first use and rebuilt after the definition changes.
+        """
+        if self._transition_table is None:
+            self._build_transitions()
+        return self._transition_table
+    
+    def get_available_actions(self, state_id: str) -> List[Action]:
+        """
+        Get the actions that can be executed from the given state.
+        
+        Built together with the transition table; callers must not modify
+        the returned list.
+        """
+        if self._available_actions is None:
+            self._build_transitions()
+        return self._available_actions.get(state_id, [])
+    
+    def get_available_action_dicts(self, state_id: str) -> List[dict]:
+        """
+        Get the dictionary representations of the actions available from a state.
+        
+        Same order as get_available_actions; callers must not modify the
+        returned list or its dicts.
+        """
+        if self._available_action_dicts is None:
+            self._build_transitions()
+        return self._available_action_dicts.get(state_id, [])
+    
+    @property
+    def initial_state_id(self) -> Optional[str]:
+        """ID of the initial state, recorded when the state is added."""
+        return self._initial_state_id
     
     def get_initial_state(self) -> Optional[State]:
         """Get the initial state of the workflow."""
-        initial_states = [state for state in self.states.values() if state.is_initial]
-        return initial_states[0] if initial_states else None
+        return self.states.get(self._initial_state_id)
     
     def validate(self) -> List[str]:
         """
@@ -61,30 +186,20 @@ class WorkflowDefinition:
         """
         errors = []
         
-        # Check for exactly one initial state
-        initial_states = [state for state in self.states.values() if state.is_initial]
-        if len(initial_states) == 0:
+        # Check for an initial state; add_state rejects a second one
+        if self._initial_state_id is None:
             errors.append("Workflow must have exactly one initial state")
-        elif len(initial_states) > 1:
-            errors.append("Workflow must have exactly one initial state, found multiple")
         
-        # Check for duplicate state IDs (already handled in add_state, but double-check)
-        state_ids = [state.id for state in self.states.values()]
-        if len(state_ids) != len(set(state_ids)):
-            errors.append("Duplicate state IDs found")
-        
-        # Check for duplicate action IDs (already handled in add_action, but double-check)
-        action_ids = [action.id for action in self.actions.values()]
-        if len(action_ids) != len(set(action_ids)):
-            errors.append("Duplicate action IDs found")
+        # Duplicate state and action IDs are rejected by add_state/add_action
         
         # Validate that all action from_states and to_state reference existing states
+        states = self.states
         for action in self.actions.values():
             for from_state_id in action.from_states:
-                if from_state_id not in self.states:
+                if from_state_id not in states:
                     errors.append(f"Action '{action.id}' references non-existent from_state '{from_state_id}'")
             
-            if action.to_state not in self.states:
+            if action.to_state not in states:
                 errors.append(f"Action '{action.id}' references non-existent to_state '{action.to_state}'")
         
         return errors
@@ -94,14 +209,21 @@ class WorkflowDefinition:
         return len(self.validate()) == 0
     
     def to_dict(self) -> dict:
-        """Convert workflow definition to dictionary representation."""
-        return {
-            'id': self.id,
-            'name': self.name,
-            'description': self.description,
-            'states': {state_id: state.to_dict() for state_id, state in self.states.items()},
-            'actions': {action_id: action.to_dict() for action_id, action in self.actions.items()}
-        }
+        """
+        Convert workflow definition to dictionary representation.
+        
+        The result is cached until the next add_state/add_action call, so
+        callers must not modify it.
+        """
+        if self._dict_cache is None:
+            self._dict_cache = {
+                'id': self.id,
+                'name': self.name,
+                'description': self.description,
+                'states': {state_id: state.to_dict() for state_id, state in self.states.items()},
+                'actions': {action_id: action.to_dict() for action_id, action in self.actions.items()}
+            }
+        return self._dict_cache
     
     @classmethod
     def from_dict(cls, data: dict) -> 'WorkflowDefinition':
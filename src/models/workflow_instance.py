@@ -4,33 +4,73 @@ Workflow Instance model for the workflow engine.
 A WorkflowInstance represents a running instance of a workflow definition.
 """
 
-from dataclasses import dataclass, field
-from datetime import datetime
-from typing import List, Optional
+import time
+import weakref
+from array import array
+from dataclasses import InitVar, dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterator, List, Optional, Union
+from src.models.action import Action
 from src.models.workflow_definition import WorkflowDefinition
 
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
 
-@dataclass
+
+def _parse_datetime(value) -> datetime:
+    """Accept either a datetime or its ISO 8601 string form."""
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+
+def _utc_now() -> datetime:
+    """Get the current time as an aware UTC datetime."""
+    return datetime.now(timezone.utc)
+
+
+def _to_utc(value: datetime) -> datetime:
+    """Convert a datetime (naive values are taken as local time) to aware UTC."""
+    return value.astimezone(timezone.utc)
+
+
+def _ns_to_datetime(timestamp_ns: int) -> datetime:
+    """Convert nanoseconds since the epoch to an aware UTC datetime."""
+    return _EPOCH + timedelta(microseconds=timestamp_ns // 1000)
+
+
+def _datetime_to_ns(value: datetime) -> int:
+    """Convert a datetime (naive values are taken as local time) to nanoseconds since the epoch."""
+    if value.tzinfo is None:
+        value = value.astimezone()
+    return (value - _EPOCH) // timedelta(microseconds=1) * 1000
+
+
+@dataclass(slots=True, frozen=True, repr=False)
 class HistoryEntry:
     """
     Represents a single entry in the workflow instance history.
     
     Attributes:
         action_id: ID of the action that was executed
-        timestamp: When the action was executed
         from_state_id: State ID before the action
         to_state_id: State ID after the action
+        timestamp_ns: When the action was executed, in nanoseconds since the epoch
     """
     action_id: str
-    timestamp: datetime
     from_state_id: str
     to_state_id: str
+    timestamp_ns: int = field(default_factory=time.time_ns)
+    
+    @property
+    def timestamp(self) -> datetime:
+        """When the action was executed, as a UTC datetime."""
+        return _ns_to_datetime(self.timestamp_ns)
     
     def to_dict(self) -> dict:
         """Convert history entry to dictionary representation."""
         return {
             'action_id': self.action_id,
-            'timestamp': self.timestamp.isoformat(),
+            'timestamp': self.timestamp,
             'from_state_id': self.from_state_id,
             'to_state_id': self.to_state_id
         }
@@ -38,15 +78,88 @@ class HistoryEntry:
     @classmethod
     def from_dict(cls, data: dict) -> 'HistoryEntry':
         """Create HistoryEntry instance from dictionary."""
+        if 'timestamp_ns' in data:
+            timestamp_ns = data['timestamp_ns']
+        else:
+            timestamp_ns = _datetime_to_ns(_parse_datetime(data['timestamp']))
         return cls(
             action_id=data['action_id'],
-            timestamp=datetime.fromisoformat(data['timestamp']),
             from_state_id=data['from_state_id'],
-            to_state_id=data['to_state_id']
+            to_state_id=data['to_state_id'],
+            timestamp_ns=timestamp_ns
+        )
+
+
+@dataclass(slots=True)
+class History:
+    """
+    Execution history of a workflow instance.
+    
+    Entries are stored as parallel arrays rather than one object per
+    entry; HistoryEntry objects are only built when the history is
+    iterated or indexed.
+    
+    Attributes:
+        action_ids: IDs of the executed actions
+        timestamps_ns: Execution times in nanoseconds since the epoch
+        from_state_ids: State IDs before each action
+        to_state_ids: State IDs after each action
+    """
+    action_ids: List[str] = field(default_factory=list)
+    timestamps_ns: array = field(default_factory=lambda: array('q'))
+    from_state_ids: List[str] = field(default_factory=list)
+    to_state_ids: List[str] = field(default_factory=list)
+    
+    def append(self, action_id: str, from_state_id: str, to_state_id: str,
+               timestamp_ns: Optional[int] = None) -> None:
+        """Record an executed action, timestamped now unless given."""
+        self.action_ids.append(action_id)
+        self.timestamps_ns.append(time.time_ns() if timestamp_ns is None else timestamp_ns)
+        self.from_state_ids.append(from_state_id)
+        self.to_state_ids.append(to_state_id)
+    
+    def add_entry(self, entry: HistoryEntry) -> None:
+        """Record an existing history entry."""
+        self.append(entry.action_id, entry.from_state_id, entry.to_state_id, entry.timestamp_ns)
+    
+    def __len__(self) -> int:
+        return len(self.action_ids)
+    
+    def __getitem__(self, index: Union[int, slice]) -> Union[HistoryEntry, List[HistoryEntry]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return HistoryEntry(
+            action_id=self.action_ids[index],
+            from_state_id=self.from_state_ids[index],
+            to_state_id=self.to_state_ids[index],
+            timestamp_ns=self.timestamps_ns[index]
         )
+    
+    def __iter__(self) -> Iterator[HistoryEntry]:
+        for action_id, timestamp_ns, from_state_id, to_state_id in zip(
+                self.action_ids, self.timestamps_ns, self.from_state_ids, self.to_state_ids):
+            yield HistoryEntry(
+                action_id=action_id,
+                from_state_id=from_state_id,
+                to_state_id=to_state_id,
+                timestamp_ns=timestamp_ns
+            )
+    
+    def to_list(self) -> List[dict]:
+        """Convert the history to a list of entry dictionaries."""
+        return [
+            {
+                'action_id': action_id,
+                'timestamp': _ns_to_datetime(timestamp_ns),
+                'from_state_id': from_state_id,
+                'to_state_id': to_state_id
+            }
+            for action_id, timestamp_ns, from_state_id, to_state_id in zip(
+                self.action_ids, self.timestamps_ns, self.from_state_ids, self.to_state_ids)
+        ]
 
 
-@dataclass
+@dataclass(slots=True)
 class WorkflowInstance:
     """
     Represents a running instance of a workflow definition.
@@ -55,18 +168,23 @@ class WorkflowInstance:
         id: Unique identifier for the workflow instance
         definition_id: ID of the workflow definition this instance is based on
         current_state_id: ID of the current state
-        history: List of executed actions with timestamps
-        created_at: When the instance was created
-        definition: Reference to the workflow definition (not persisted)
+        history: Executed actions with timestamps
+        created_at: When the instance was created, in UTC
+        definition: Reference to the workflow definition (not persisted);
+            if not given, it is looked up on first access through the
+            resolver set with set_definition_resolver
     """
     id: str
     definition_id: str
     current_state_id: str
-    history: List[HistoryEntry] = field(default_factory=list)
-    created_at: datetime = field(default_factory=datetime.now)
-    definition: Optional[WorkflowDefinition] = field(default=None, repr=False)
+    history: History = field(default_factory=History)
+    created_at: datetime = field(default_factory=_utc_now)
+    definition: InitVar[Optional[WorkflowDefinition]] = None
+    _definition: Optional[WorkflowDefinition] = field(default=None, init=False, repr=False, compare=False)
+    _definition_resolver: Optional[weakref.WeakMethod] = field(default=None, init=False, repr=False, compare=False)
+    _version: int = field(default=0, init=False, repr=False, compare=False)
     
-    def __post_init__(self):
+    def __post_init__(self, definition: Optional[WorkflowDefinition]):
         """Validate workflow instance after initialization."""
         if not self.id or not isinstance(self.id, str):
             raise ValueError("Workflow instance ID must be a non-empty string")
@@ -74,6 +192,29 @@ class WorkflowInstance:
             raise ValueError("Workflow instance must reference a valid definition ID")
         if not self.current_state_id or not isinstance(self.current_state_id, str):
             raise ValueError("Workflow instance must have a valid current state ID")
+        self._definition = definition
+    
+    def _get_definition(self) -> Optional[WorkflowDefinition]:
+        """Get the definition, resolving and keeping it on first access if needed."""
+        definition = self._definition
+        if definition is None and self._definition_resolver is not None:
+            resolve = self._definition_resolver()
+            if resolve is not None:
+                definition = self._definition = resolve(self.definition_id)
+        return definition
+    
+    def _set_definition(self, definition: Optional[WorkflowDefinition]) -> None:
+        """Attach the definition."""
+        self._definition = definition
+    
+    def set_definition_resolver(self, resolver: Callable[[str], Optional[WorkflowDefinition]]) -> None:
+        """
+        Set the bound method used to look up the definition when none is attached.
+        
+        It is called with the definition ID and only held weakly, so the
+        instance does not keep its owner (e.g. a service) alive.
+        """
+        self._definition_resolver = weakref.WeakMethod(resolver)
     
     def can_execute_action(self, action_id: str) -> tuple[bool, str]:
         """
@@ -82,22 +223,27 @@ class WorkflowInstance:
         Returns:
             Tuple of (can_execute: bool, reason: str)
         """
-        if not self.definition:
+        definition = self.definition
+        if not definition:
             return False, "Workflow definition not loaded"
         
+        # Every executable transition is in the transition table; the checks
+        # below only run to explain why an action cannot be executed
+        if (self.current_state_id, action_id) in definition.get_transition_table():
+            return True, "Action can be executed"
+        
         # Check if action exists
-        if action_id not in self.definition.actions:
+        if action_id not in definition.actions:
             return False, f"Action '{action_id}' does not exist in workflow definition"
         
-        action = self.definition.actions[action_id]
+        action = definition.actions[action_id]
         
         # Check if action is enabled
         if not action.enabled:
             return False, f"Action '{action_id}' is disabled"
         
         # Check if current state is final
-        current_state = self.definition.states.get(self.current_state_id)
-        if current_state and current_state.is_final:
+        if definition.is_final_state(self.current_state_id):
             return False, f"Cannot execute actions from final state '{self.current_state_id}'"
         
         # Check if action can be executed from current state
@@ -105,9 +251,14 @@ class WorkflowInstance:
             return False, f"Action '{action_id}' cannot be executed from state '{self.current_state_id}'"
         
         # Check if target state exists
-        if action.to_state not in self.definition.states:
+        if action.to_state not in definition.states:
             return False, f"Action '{action_id}' targets non-existent state '{action.to_state}'"
         
+        # Check if current state exists; the transition table only covers
+        # states of the definition
+        if self.current_state_id not in definition.states:
+            return False, f"Current state '{self.current_state_id}' does not exist in workflow definition"
+        
         return True, "Action can be executed"
     
     def execute_action(self, action_id: str) -> tuple[bool, str]:
@@ -117,37 +268,62 @@ class WorkflowInstance:
         Returns:
             Tuple of (success: bool, message: str)
         """
-        can_execute, reason = self.can_execute_action(action_id)
-        if not can_execute:
+        to_state_id = None
+        definition = self.definition
+        if definition:
+            to_state_id = definition.get_transition_table().get((self.current_state_id, action_id))
+        if to_state_id is None:
+            can_execute, reason = self.can_execute_action(action_id)
+            if can_execute:
+                # The checks above mirror the table; never report a miss as success
+                reason = f"Action '{action_id}' cannot be executed from state '{self.current_state_id}'"
             return False, reason
         
-        action = self.definition.actions[action_id]
         old_state_id = self.current_state_id
         
         # Update current state
-        self.current_state_id = action.to_state
+        self.current_state_id = to_state_id
         
         # Add to history
-        history_entry = HistoryEntry(
-            action_id=action_id,
-            timestamp=datetime.now(),
-            from_state_id=old_state_id,
-            to_state_id=action.to_state
-        )
-        self.history.append(history_entry)
+        self.history.append(action_id, old_state_id, to_state_id)
+        self._version += 1
         
         return True, f"Action '{action_id}' executed successfully"
     
+    @property
+    def version(self) -> int:
+        """Counter that increases every time an action is executed."""
+        return self._version
+    
+    def get_available_actions(self) -> List[Action]:
+        """Get the actions that can be executed from the current state."""
+        definition = self.definition
+        if not definition or definition.is_final_state(self.current_state_id):
+            return []
+        return definition.get_available_actions(self.current_state_id)
+    
+    def get_available_action_dicts(self) -> List[dict]:
+        """
+        Get the dictionary representations of the actions executable from the current state.
+        
+        These are the definition's cached dicts; callers must not modify them.
+        """
+        definition = self.definition
+        if not definition or definition.is_final_state(self.current_state_id):
+            return []
+        return definition.get_available_action_dicts(self.current_state_id)
+    
     def get_current_state(self):
         """Get the current state object."""
-        if self.definition and self.current_state_id in self.definition.states:
-            return self.definition.states[self.current_state_id]
+        definition = self.definition
+        if definition:
+            return definition.states.get(self.current_state_id)
         return None
     
     def is_in_final_state(self) -> bool:
         """Check if the instance is in a final state."""
-        current_state = self.get_current_state()
-        return current_state.is_final if current_state else False
+        definition = self.definition
+        return definition is not None and definition.is_final_state(self.current_state_id)
     
     def to_dict(self) -> dict:
         """Convert workflow instance to dictionary representation."""
@@ -155,8 +331,8 @@ class WorkflowInstance:
             'id': self.id,
             'definition_id': self.definition_id,
             'current_state_id': self.current_state_id,
-            'history': [entry.to_dict() for entry in self.history],
-            'created_at': self.created_at.isoformat(),
+            'history': self.history.to_list(),
+            'created_at': self.created_at,
             'is_final': self.is_in_final_state()
         }
     
@@ -167,13 +343,18 @@ class WorkflowInstance:
             id=data['id'],
             definition_id=data['definition_id'],
             current_state_id=data['current_state_id'],
-            created_at=datetime.fromisoformat(data['created_at'])
+            created_at=_to_utc(_parse_datetime(data['created_at']))
         )
         
         # Add history entries
         for entry_data in data.get('history', []):
             entry = HistoryEntry.from_dict(entry_data)
-            instance.history.append(entry)
+            instance.history.add_entry(entry)
         
         return instance
 
+
+# The dataclass takes ``definition`` as an init-only argument; reads and
+# writes afterwards go through this property so that a missing definition
+# can be resolved lazily
+WorkflowInstance.definition = property(WorkflowInstance._get_definition, WorkflowInstance._set_definition)
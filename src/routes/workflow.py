@@ -4,15 +4,51 @@ Workflow API routes for the workflow engine.
 This module defines all HTTP endpoints for workflow management.
 """
 
-from flask import Blueprint, request, jsonify, current_app
-from typing import Dict, Any
+import uuid
+import orjson
+from flask import Blueprint, Response, request, jsonify, current_app
+from typing import Any, Iterable, Optional
+from src.json_encoding import dumps
+from src.services.workflow_service import WorkflowService
 
-workflow_bp = Blueprint('workflow', __name__)
+# Page size limits for GET /instances
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
 
+# Distinguishes ETags issued by this process from those of an earlier run,
+# whose objects may share IDs and versions with different content
+ETAG_PREFIX = uuid.uuid4().hex[:8]
 
-def get_workflow_service():
-    """Get the workflow service instance from the Flask app."""
-    return current_app.workflow_service
+
+def get_json_body() -> Any:
+    """
+    Parse the request body as JSON.
+    
+    Decodes the raw body with orjson directly rather than going through
+    request.get_json(). Returns None if the request is not JSON or the body
+    cannot be parsed.
+    """
+    if not request.is_json:
+        return None
+    try:
+        return orjson.loads(request.get_data(cache=False))
+    except orjson.JSONDecodeError:
+        return None
+
+
+def get_missing_field_error(data: Any, required_fields: Iterable[str]) -> Optional[tuple]:
+    """
+    Check that a JSON payload is an object containing all required fields.
+    
+    Returns an error response for the first problem found, or None if the
+    payload is valid.
+    """
+    if not data or not isinstance(data, dict):
+        return create_error_response("Request body must contain JSON data")
+    for field in required_fields:
+        if field not in data:
+            return create_error_response(f"Missing required field: {field}")
+    return None
 
 
 def create_error_response(message: str, status_code: int = 400) -> tuple:
@@ -20,62 +56,93 @@ def create_error_response(message: str, status_code: int = 400) -> tuple:
     return jsonify({'error': message, 'success': False}), status_code
 
 
-def create_success_response(data: Any = None, message: str = None) -> tuple:
-    """Create a standardized success response."""
+def create_success_response(data: Any = None, message: str = None, etag: str = None) -> tuple:
+    """Create a standardized success response, optionally tagged with a weak ETag."""
     response = {'success': True}
     if message:
         response['message'] = message
     if data is not None:
         response['data'] = data
-    return jsonify(response), 200
+    response = jsonify(response)
+    if etag:
+        response.set_etag(etag, weak=True)
+    return response, 200
+
+
+def create_json_bytes_response(body: bytes, etag: str = None) -> Response:
+    """Create a response from an already encoded JSON body."""
+    response = Response(body, mimetype='application/json', direct_passthrough=True)
+    if etag:
+        response.set_etag(etag, weak=True)
+    return response
 
 
-# Workflow Definition Endpoints
+def make_etag(version: int) -> str:
+    """Build the ETag value for an object at the given version."""
+    return f"{ETAG_PREFIX}-{version}"
 
-@workflow_bp.route('/definitions', methods=['POST'])
-def create_workflow_definition():
+
+def create_not_modified_response(etag: str):
     """
-    Create a new workflow definition.
+    Return a 304 response if the client already holds ``etag``.
     
-    Expected JSON payload:
-    {
-        "id": "string",
-        "name": "string",
-        "description": "string (optional)",
-        "states": [
-            {
-                "id": "string",
-                "name": "string",
-                "is_initial": boolean,
-                "is_final": boolean,
-                "enabled": boolean,
-                "description": "string (optional)"
-            }
-        ],
-        "actions": [
-            {
-                "id": "string",
-                "name": "string",
-                "enabled": boolean,
-                "from_states": ["state_id1", "state_id2"],
-                "to_state": "state_id",
-                "description": "string (optional)"
-            }
-        ]
-    }
+    Returns None when the request is not conditional on this ETag.
     """
-    try:
-        data = request.get_json()
-        if not data:
-            return create_error_response("Request body must contain JSON data")
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    response = current_app.response_class(status=304)
+    response.set_etag(etag, weak=True)
+    return response
+
+
+def create_workflow_blueprint(service: WorkflowService) -> Blueprint:
+    """
+    Create the blueprint exposing the workflow API.
+    
+    The view functions close over ``service`` directly instead of looking
+    it up on ``current_app`` for every request.
+    """
+    workflow_bp = Blueprint('workflow', __name__)
+    
+    # Workflow Definition Endpoints
+    
+    @workflow_bp.route('/definitions', methods=['POST'])
+    def create_workflow_definition():
+        """
+        Create a new workflow definition.
         
-        # Validate required fields
-        required_fields = ['id', 'name']
-        for field in required_fields:
-            if field not in data:
-                return create_error_response(f"Missing required field: {field}")
+        Expected JSON payload:
+        {
+            "id": "string",
+            "name": "string",
+            "description": "string (optional)",
+            "states": [
+                {
+                    "id": "string",
+                    "name": "string",
+                    "is_initial": boolean,
+                    "is_final": boolean,
+                    "enabled": boolean,
+                    "description": "string (optional)"
+                }
+            ],
+            "actions": [
+                {
+                    "id": "string",
+                    "name": "string",
+                    "enabled": boolean,
+                    "from_states": ["state_id1", "state_id2"],
+                    "to_state": "state_id",
+                    "description": "string (optional)"
+                }
+            ]
+        }
+        """
+        data = get_json_body()
+        error = get_missing_field_error(data, ('id', 'name'))
+        if error:
+            return error
         
-        service = get_workflow_service()
         success, message, definition = service.create_workflow_definition(data)
         
         if success:
@@ -85,69 +152,51 @@ def create_workflow_definition():
             )
         else:
             return create_error_response(message)
-            
-    except Exception as e:
-        return create_error_response(f"Internal server error: {str(e)}", 500)
-
-
-@workflow_bp.route('/definitions/<definition_id>', methods=['GET'])
-def get_workflow_definition(definition_id: str):
-    """
-    Retrieve a workflow definition by ID.
-    """
-    try:
-        service = get_workflow_service()
+    
+    @workflow_bp.route('/definitions/<definition_id>', methods=['GET'])
+    def get_workflow_definition(definition_id: str):
+        """
+        Retrieve a workflow definition by ID.
+        """
         definition = service.get_workflow_definition(definition_id)
         
         if definition:
-            return create_success_response(data=definition.to_dict())
+            etag = make_etag(definition.version)
+            not_modified = create_not_modified_response(etag)
+            if not_modified:
+                return not_modified
+            return create_json_bytes_response(
+                service.get_workflow_definition_response_json(definition_id),
+                etag=etag
+            )
         else:
             return create_error_response(f"Workflow definition '{definition_id}' not found", 404)
-            
-    except Exception as e:
-        return create_error_response(f"Internal server error: {str(e)}", 500)
-
-
-@workflow_bp.route('/definitions', methods=['GET'])
-def list_workflow_definitions():
-    """
-    List all workflow definitions.
-    """
-    try:
-        service = get_workflow_service()
-        definitions = service.list_workflow_definitions()
-        
-        return create_success_response(
-            data=[definition.to_dict() for definition in definitions]
-        )
-        
-    except Exception as e:
-        return create_error_response(f"Internal server error: {str(e)}", 500)
-
-
-# Workflow Instance Endpoints
-
-@workflow_bp.route('/instances', methods=['POST'])
-def start_workflow_instance():
-    """
-    Start a new workflow instance.
     
-    Expected JSON payload:
-    {
-        "definition_id": "string",
-        "instance_id": "string (optional)"
-    }
-    """
-    try:
-        data = request.get_json()
-        if not data:
-            return create_error_response("Request body must contain JSON data")
+    @workflow_bp.route('/definitions', methods=['GET'])
+    def list_workflow_definitions():
+        """
+        List all workflow definitions.
+        """
+        return create_json_bytes_response(service.list_workflow_definitions_response_json())
+    
+    # Workflow Instance Endpoints
+    
+    @workflow_bp.route('/instances', methods=['POST'])
+    def start_workflow_instance():
+        """
+        Start a new workflow instance.
         
-        # Validate required fields
-        if 'definition_id' not in data:
-            return create_error_response("Missing required field: definition_id")
+        Expected JSON payload:
+        {
+            "definition_id": "string",
+            "instance_id": "string (optional)"
+        }
+        """
+        data = get_json_body()
+        error = get_missing_field_error(data, ('definition_id',))
+        if error:
+            return error
         
-        service = get_workflow_service()
         success, message, instance = service.start_workflow_instance(
             definition_id=data['definition_id'],
             instance_id=data.get('instance_id')
@@ -160,98 +209,104 @@ def start_workflow_instance():
             )
         else:
             return create_error_response(message)
-            
-    except Exception as e:
-        return create_error_response(f"Internal server error: {str(e)}", 500)
-
-
-@workflow_bp.route('/instances/<instance_id>', methods=['GET'])
-def get_workflow_instance(instance_id: str):
-    """
-    Retrieve a workflow instance by ID with current state and available actions.
-    """
-    try:
-        service = get_workflow_service()
-        summary = service.get_instance_summary(instance_id)
+    
+    @workflow_bp.route('/instances/<instance_id>', methods=['GET'])
+    def get_workflow_instance(instance_id: str):
+        """
+        Retrieve a workflow instance by ID with current state and available actions.
+        """
+        instance = service.get_workflow_instance(instance_id)
         
-        if summary:
-            return create_success_response(data=summary)
+        if instance:
+            etag = make_etag(instance.version)
+            not_modified = create_not_modified_response(etag)
+            if not_modified:
+                return not_modified
+            return create_success_response(
+                data=orjson.Fragment(service.get_instance_summary_json(instance_id)),
+                etag=etag
+            )
         else:
             return create_error_response(f"Workflow instance '{instance_id}' not found", 404)
-            
-    except Exception as e:
-        return create_error_response(f"Internal server error: {str(e)}", 500)
-
-
-@workflow_bp.route('/instances', methods=['GET'])
-def list_workflow_instances():
-    """
-    List all workflow instances.
-    """
-    try:
-        service = get_workflow_service()
-        instances = service.list_workflow_instances()
+    
+    @workflow_bp.route('/instances', methods=['GET'])
+    def list_workflow_instances():
+        """
+        List workflow instances, one page at a time.
         
-        return create_success_response(
-            data=[instance.to_dict() for instance in instances]
-        )
+        Query parameters:
+            limit: Page size (default 100, at most 1000)
+            after: ID of the last instance of the previous page
         
-    except Exception as e:
-        return create_error_response(f"Internal server error: {str(e)}", 500)
-
-
-@workflow_bp.route('/instances/<instance_id>/actions/<action_id>', methods=['POST'])
-def execute_action(instance_id: str, action_id: str):
-    """
-    Execute an action on a workflow instance.
-    """
-    try:
-        service = get_workflow_service()
-        success, message = service.execute_action(instance_id, action_id)
+        The response is streamed one encoded instance at a time. Its
+        "next_after" field holds the cursor for the next page, or null on
+        the last page.
+        """
+        limit = request.args.get('limit')
+        if limit is None:
+            limit = DEFAULT_PAGE_SIZE
+        else:
+            try:
+                limit = int(limit)
+            except ValueError:
+                return create_error_response("limit must be a positive integer")
+        if limit < 1:
+            return create_error_response("limit must be a positive integer")
+        limit = min(limit, MAX_PAGE_SIZE)
+        
+        after = request.args.get('after')
+        if after is not None and not service.get_workflow_instance(after):
+            return create_error_response(f"Workflow instance '{after}' not found")
+        
+        instances = service.list_workflow_instances(limit=limit, after=after)
+        next_after = None
+        if instances and service.has_instances_after(instances[-1].id):
+            next_after = instances[-1].id
+        
+        # Keys in sorted order, like every other response; the separator is
+        # sent with its instance so each instance is a single write
+        def generate():
+            yield b'{"data":['
+            for index, instance in enumerate(instances):
+                yield (b',' if index else b'') + dumps(instance.to_dict())
+            yield b'],"next_after":' + dumps(next_after) + b',"success":true}'
+        
+        return Response(generate(), mimetype='application/json', direct_passthrough=True)
+    
+    @workflow_bp.route('/instances/<instance_id>/actions/<action_id>', methods=['POST'])
+    def execute_action(instance_id: str, action_id: str):
+        """
+        Execute an action on a workflow instance.
+        """
+        success, message, summary_json = service.execute_action(instance_id, action_id)
         
         if success:
-            # Get updated instance summary
-            summary = service.get_instance_summary(instance_id)
             return create_success_response(
-                data=summary,
+                data=orjson.Fragment(summary_json),
                 message=message
             )
         else:
             return create_error_response(message)
-            
-    except Exception as e:
-        return create_error_response(f"Internal server error: {str(e)}", 500)
-
-
-@workflow_bp.route('/instances/<instance_id>/actions', methods=['GET'])
-def get_available_actions(instance_id: str):
-    """
-    Get all actions that can be executed from the current state of an instance.
-    """
-    try:
-        service = get_workflow_service()
-        actions = service.get_available_actions(instance_id)
+    
+    @workflow_bp.route('/instances/<instance_id>/actions', methods=['GET'])
+    def get_available_actions(instance_id: str):
+        """
+        Get all actions that can be executed from the current state of an instance.
+        """
+        actions_json = service.get_available_actions_response_json(instance_id)
         
-        if actions is not None:
-            return create_success_response(
-                data=[action.to_dict() for action in actions]
-            )
+        if actions_json is not None:
+            return create_json_bytes_response(actions_json)
         else:
             return create_error_response(f"Workflow instance '{instance_id}' not found", 404)
-            
-    except Exception as e:
-        return create_error_response(f"Internal server error: {str(e)}", 500)
-
-
-# Utility Endpoints
-
-@workflow_bp.route('/health', methods=['GET'])
-def workflow_health():
-    """
-    Health check endpoint for workflow service.
-    """
-    try:
-        service = get_workflow_service()
+    
+    # Utility Endpoints
+    
+    @workflow_bp.route('/health', methods=['GET'])
+    def workflow_health():
+        """
+        Health check endpoint for workflow service.
+        """
         definitions_count = len(service.definitions)
         instances_count = len(service.instances)
         
@@ -263,7 +318,5 @@ def workflow_health():
                 'instances_count': instances_count
             }
         )
-        
-    except Exception as e:
-        return create_error_response(f"Internal server error: {str(e)}", 500)
-
+    
+    return workflow_bp
@@ -4,10 +4,26 @@ Workflow Service for managing workflow definitions and instances.
 This service provides the core business logic for the workflow engine.
 """
 
+import threading
 import uuid
-from typing import Dict, List, Optional, Tuple
+from collections import Counter, defaultdict
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+import orjson
+from src.json_encoding import dumps
 from src.models import State, Action, WorkflowDefinition, WorkflowInstance
 
+# Number of encoded instance summaries kept by WorkflowService
+SUMMARY_CACHE_SIZE = 1024
+
+# Available actions response for instances in a final state
+_NO_ACTIONS_RESPONSE_JSON = dumps({'success': True, 'data': []})
+
+# Success messages; the ID is already in the returned object
+_MSG_DEFINITION_CREATED = "Workflow definition created successfully"
+_MSG_INSTANCE_STARTED = "Workflow instance started successfully"
+_MSG_INSTANCES_STARTED = "Workflow instances started successfully"
+
 
 class WorkflowService:
     """
@@ -23,6 +39,23 @@ class WorkflowService:
         """Initialize the workflow service with empty storage."""
         self.definitions: Dict[str, WorkflowDefinition] = {}
         self.instances: Dict[str, WorkflowInstance] = {}
+        # Instance IDs in creation order, and each ID's position, for paging
+        self._instance_ids: List[str] = []
+        self._instance_positions: Dict[str, int] = {}
+        # definition_id -> IDs of the instances started from it
+        self.instances_by_definition: Dict[str, Set[str]] = defaultdict(set)
+        # instance_id -> lock serializing actions on that instance
+        self._instance_locks: Dict[str, threading.Lock] = {}
+        # definition_id -> (dict it was encoded from, JSON bytes)
+        self._definition_json: Dict[str, Tuple[dict, bytes]] = {}
+        # definition_id -> (definition JSON it wraps, full success response bytes)
+        self._serialized_cache: Dict[str, Tuple[bytes, bytes]] = {}
+        # (definition JSON parts, full success response bytes) for the definition list
+        self._definitions_list_cache: Optional[Tuple[Tuple[bytes, ...], bytes]] = None
+        # (definition_id, state_id) -> (action dicts they were encoded from, full success response bytes)
+        self._available_cache: Dict[Tuple[str, str], Tuple[List[dict], bytes]] = {}
+        # (instance_id, version) -> JSON bytes of the instance summary
+        self._summary_json = lru_cache(maxsize=SUMMARY_CACHE_SIZE)(self._encode_instance_summary)
     
     # Workflow Definition Management
     
@@ -36,6 +69,11 @@ class WorkflowService:
         Returns:
             Tuple of (success: bool, message: str, definition: Optional[WorkflowDefinition])
         """
+        if 'id' not in definition_data or 'name' not in definition_data:
+            return False, "Workflow definition requires 'id' and 'name'", None
+        
+        # Only building the models from the request data is expected to
+        # fail; anything else is a bug and is left to the app's handler
         try:
             # Create workflow definition
             definition = WorkflowDefinition(
@@ -44,32 +82,39 @@ class WorkflowService:
                 description=definition_data.get('description')
             )
             
-            # Check if definition already exists
-            if definition.id in self.definitions:
-                return False, f"Workflow definition with ID '{definition.id}' already exists", None
-            
-            # Add states
-            for state_data in definition_data.get('states', []):
-                state = State.from_dict(state_data)
-                definition.add_state(state)
-            
-            # Add actions
-            for action_data in definition_data.get('actions', []):
-                action = Action.from_dict(action_data)
-                definition.add_action(action)
-            
-            # Validate the definition
-            validation_errors = definition.validate()
-            if validation_errors:
-                return False, f"Validation errors: {'; '.join(validation_errors)}", None
-            
-            # Store the definition
-            self.definitions[definition.id] = definition
-            
-            return True, f"Workflow definition '{definition.id}' created successfully", definition
-            
-        except Exception as e:
+            # Build states and actions in bulk
+            states_data = definition_data.get('states', [])
+            states = {state.id: state for state in map(State.from_dict, states_data)}
+            actions_data = definition_data.get('actions', [])
+            actions = {action.id: action for action in map(Action.from_dict, actions_data)}
+        except (KeyError, TypeError, ValueError) as e:
             return False, f"Error creating workflow definition: {str(e)}", None
+        
+        # Check if definition already exists
+        if definition.id in self.definitions:
+            return False, f"Workflow definition with ID '{definition.id}' already exists", None
+        
+        # A repeated ID collapses into one dict entry, so a length mismatch
+        # means duplicates
+        if len(states) != len(states_data):
+            return False, "Duplicate state IDs found", None
+        if len(actions) != len(actions_data):
+            return False, "Duplicate action IDs found", None
+        
+        try:
+            definition.set_contents(states, actions)
+        except ValueError as e:
+            return False, f"Error creating workflow definition: {str(e)}", None
+        
+        # Validate the definition
+        validation_errors = definition.validate()
+        if validation_errors:
+            return False, f"Validation errors: {'; '.join(validation_errors)}", None
+        
+        # Store the definition
+        self.definitions[definition.id] = definition
+        
+        return True, _MSG_DEFINITION_CREATED, definition
     
     def get_workflow_definition(self, definition_id: str) -> Optional[WorkflowDefinition]:
         """
@@ -83,14 +128,92 @@ class WorkflowService:
         """
         return self.definitions.get(definition_id)
     
-    def list_workflow_definitions(self) -> List[WorkflowDefinition]:
+    def list_workflow_definitions(self) -> Iterable[WorkflowDefinition]:
         """
         Get all workflow definitions.
         
         Returns:
-            List of all workflow definitions
+            Live view of all workflow definitions; callers that need a
+            snapshot should copy it
+        """
+        return self.definitions.values()
+    
+    def get_workflow_definition_json(self, definition_id: str) -> Optional[bytes]:
+        """
+        Retrieve the JSON encoding of a workflow definition.
+        
+        The bytes are reused for as long as the definition's cached
+        to_dict() result is, so they are rebuilt only after the definition
+        changes.
+        
+        Args:
+            definition_id: ID of the workflow definition
+            
+        Returns:
+            JSON bytes if found, None otherwise
+        """
+        definition = self.definitions.get(definition_id)
+        if not definition:
+            return None
+        
+        data = definition.to_dict()
+        cached = self._definition_json.get(definition_id)
+        if cached is None or cached[0] is not data:
+            cached = (data, dumps(data))
+            self._definition_json[definition_id] = cached
+        return cached[1]
+    
+    def list_workflow_definitions_json(self) -> List[bytes]:
+        """
+        Get the JSON encoding of every workflow definition.
+        
+        Returns:
+            List of JSON bytes, one per definition
+        """
+        return [self.get_workflow_definition_json(definition_id) for definition_id in self.definitions]
+    
+    def get_workflow_definition_response_json(self, definition_id: str) -> Optional[bytes]:
+        """
+        Retrieve the complete JSON success response for a workflow definition.
+        
+        Args:
+            definition_id: ID of the workflow definition
+            
+        Returns:
+            JSON bytes of {"success": true, "data": <definition>} if found,
+            None otherwise
         """
-        return list(self.definitions.values())
+        definition_json = self.get_workflow_definition_json(definition_id)
+        if definition_json is None:
+            return None
+        
+        cached = self._serialized_cache.get(definition_id)
+        if cached is None or cached[0] is not definition_json:
+            cached = (definition_json, self._encode_success_response(orjson.Fragment(definition_json)))
+            self._serialized_cache[definition_id] = cached
+        return cached[1]
+    
+    def list_workflow_definitions_response_json(self) -> bytes:
+        """
+        Get the complete JSON success response listing every workflow definition.
+        
+        Rebuilt only when a definition is added or one of their encodings
+        changes.
+        
+        Returns:
+            JSON bytes of {"success": true, "data": [<definition>, ...]}
+        """
+        parts = tuple(self.list_workflow_definitions_json())
+        cached = self._definitions_list_cache
+        if cached is None or cached[0] != parts:
+            cached = (parts, self._encode_success_response([orjson.Fragment(part) for part in parts]))
+            self._definitions_list_cache = cached
+        return cached[1]
+    
+    @staticmethod
+    def _encode_success_response(data) -> bytes:
+        """Encode data wrapped in the API's success response envelope."""
+        return dumps({'success': True, 'data': data})
     
     # Workflow Instance Management
     
@@ -105,40 +228,85 @@ class WorkflowService:
         Returns:
             Tuple of (success: bool, message: str, instance: Optional[WorkflowInstance])
         """
-        try:
-            # Check if definition exists
-            definition = self.definitions.get(definition_id)
-            if not definition:
-                return False, f"Workflow definition '{definition_id}' not found", None
-            
-            # Generate instance ID if not provided
-            if not instance_id:
-                instance_id = str(uuid.uuid4())
-            
-            # Check if instance ID already exists
-            if instance_id in self.instances:
-                return False, f"Workflow instance with ID '{instance_id}' already exists", None
-            
-            # Get initial state
-            initial_state = definition.get_initial_state()
-            if not initial_state:
-                return False, f"Workflow definition '{definition_id}' has no initial state", None
+        if not isinstance(definition_id, str):
+            return False, "Workflow definition ID must be a string", None
+        if instance_id is not None and not isinstance(instance_id, str):
+            return False, "Workflow instance ID must be a string", None
+        
+        # Check if definition exists
+        definition = self.definitions.get(definition_id)
+        if not definition:
+            return False, f"Workflow definition '{definition_id}' not found", None
+        
+        # Generate instance ID if not provided
+        if not instance_id:
+            instance_id = uuid.uuid4().hex
+        
+        # Check if instance ID already exists
+        if instance_id in self.instances:
+            return False, f"Workflow instance with ID '{instance_id}' already exists", None
+        
+        # Get initial state
+        initial_state_id = definition.initial_state_id
+        if initial_state_id is None:
+            return False, f"Workflow definition '{definition_id}' has no initial state", None
+        
+        # Create instance
+        instance = WorkflowInstance(
+            id=instance_id,
+            definition_id=definition_id,
+            current_state_id=initial_state_id,
+            definition=definition
+        )
+        
+        # Store the instance
+        self._store_instance(instance)
+        
+        return True, _MSG_INSTANCE_STARTED, instance
+    
+    def start_workflow_instances(self, definition_id: str, count: int) -> Tuple[bool, str, List[WorkflowInstance]]:
+        """
+        Start several workflow instances from the same definition.
+        
+        The definition and its initial state are resolved once for the
+        whole batch rather than once per start_workflow_instance call.
+        Instance IDs are always generated.
+        
+        Args:
+            definition_id: ID of the workflow definition to instantiate
+            count: Number of instances to start
             
-            # Create instance
+        Returns:
+            Tuple of (success: bool, message: str, instances: List[WorkflowInstance])
+        """
+        if not isinstance(definition_id, str):
+            return False, "Workflow definition ID must be a string", []
+        if not isinstance(count, int) or isinstance(count, bool) or count < 0:
+            return False, "Instance count must be a non-negative integer", []
+        
+        # Check if definition exists
+        definition = self.definitions.get(definition_id)
+        if not definition:
+            return False, f"Workflow definition '{definition_id}' not found", []
+        
+        # Get initial state
+        initial_state_id = definition.initial_state_id
+        if initial_state_id is None:
+            return False, f"Workflow definition '{definition_id}' has no initial state", []
+        
+        started = []
+        for _ in range(count):
+            instance_id = uuid.uuid4().hex
             instance = WorkflowInstance(
                 id=instance_id,
                 definition_id=definition_id,
-                current_state_id=initial_state.id,
+                current_state_id=initial_state_id,
                 definition=definition
             )
-            
-            # Store the instance
-            self.instances[instance_id] = instance
-            
-            return True, f"Workflow instance '{instance_id}' started successfully", instance
-            
-        except Exception as e:
-            return False, f"Error starting workflow instance: {str(e)}", None
+            self._store_instance(instance)
+            started.append(instance)
+        
+        return True, _MSG_INSTANCES_STARTED, started
     
     def get_workflow_instance(self, instance_id: str) -> Optional[WorkflowInstance]:
         """
@@ -150,27 +318,88 @@ class WorkflowService:
         Returns:
             WorkflowInstance if found, None otherwise
         """
-        instance = self.instances.get(instance_id)
-        if instance and not instance.definition:
-            # Load the definition reference if not already loaded
-            instance.definition = self.definitions.get(instance.definition_id)
-        return instance
+        return self.instances.get(instance_id)
     
-    def list_workflow_instances(self) -> List[WorkflowInstance]:
+    def list_workflow_instances(self, limit: Optional[int] = None, after: Optional[str] = None) -> Iterable[WorkflowInstance]:
         """
-        Get all workflow instances.
+        Get workflow instances in the order they were started.
         
+        Args:
+            limit: Maximum number of instances to return (all if None)
+            after: Only return instances started after the instance with this ID
+            
         Returns:
-            List of all workflow instances
+            Workflow instances; without paging arguments this is a live view
+            of all of them, as instances are stored in the order they start
+            
+        Raises:
+            KeyError: If ``after`` is not the ID of an existing instance
         """
-        instances = list(self.instances.values())
-        # Ensure all instances have their definition loaded
-        for instance in instances:
-            if not instance.definition:
-                instance.definition = self.definitions.get(instance.definition_id)
-        return instances
+        if limit is None and after is None:
+            return self.instances.values()
+        start = self._instance_positions[after] + 1 if after is not None else 0
+        end = None if limit is None else start + limit
+        return [self.instances[instance_id] for instance_id in self._instance_ids[start:end]]
     
-    def execute_action(self, instance_id: str, action_id: str) -> Tuple[bool, str]:
+    def list_instances_for_definition(self, definition_id: str) -> List[WorkflowInstance]:
+        """
+        Get the workflow instances started from a definition.
+        
+        Uses the reverse index kept by _store_instance, so the cost depends
+        on the number of matching instances, not on all instances.
+        
+        Args:
+            definition_id: ID of the workflow definition
+            
+        Returns:
+            List of workflow instances, in no particular order
+        """
+        return [self.instances[instance_id] for instance_id in self.instances_by_definition.get(definition_id, ())]
+    
+    def count_by_state(self, definition_id: str) -> Optional[Dict[str, int]]:
+        """
+        Count the instances of a definition in each of its states.
+        
+        Only the definition's own instances are visited, through the
+        reverse index kept by _store_instance.
+        
+        Args:
+            definition_id: ID of the workflow definition
+            
+        Returns:
+            Dictionary mapping every state ID of the definition to its number
+            of instances (0 if none), or None if the definition is not found
+        """
+        definition = self.definitions.get(definition_id)
+        if not definition:
+            return None
+        
+        instances = self.instances
+        counts = Counter(
+            instances[instance_id].current_state_id
+            for instance_id in self.instances_by_definition.get(definition_id, ())
+        )
+        return {state_id: counts[state_id] for state_id in definition.states}
+    
+    def _store_instance(self, instance: WorkflowInstance) -> None:
+        """
+        Store an instance.
+        
+        An instance stored without its definition, e.g. one loaded with
+        from_dict, looks it up from this service on first access.
+        """
+        if instance.definition is None:
+            instance.set_definition_resolver(self.get_workflow_definition)
+        self.instances[instance.id] = instance
+        self._instance_positions[instance.id] = len(self._instance_ids)
+        self._instance_ids.append(instance.id)
+        self.instances_by_definition[instance.definition_id].add(instance.id)
+    
+    def has_instances_after(self, instance_id: str) -> bool:
+        """Check if any instance was started after the given instance."""
+        return self._instance_positions[instance_id] + 1 < len(self._instance_ids)
+    
+    def execute_action(self, instance_id: str, action_id: str) -> Tuple[bool, str, Optional[bytes]]:
         """
         Execute an action on a workflow instance.
         
@@ -179,45 +408,83 @@ class WorkflowService:
             action_id: ID of the action to execute
             
         Returns:
-            Tuple of (success: bool, message: str)
+            Tuple of (success: bool, message: str, summary_json: Optional[bytes]),
+            where summary_json is the JSON encoding of the updated instance
+            summary on success; it goes through the summary cache, so a
+            following read of the instance is not re-encoded
         """
-        try:
-            # Get the instance
-            instance = self.get_workflow_instance(instance_id)
-            if not instance:
-                return False, f"Workflow instance '{instance_id}' not found"
-            
-            # Execute the action
+        # Get the instance
+        instance = self.instances.get(instance_id)
+        if not instance:
+            return False, f"Workflow instance '{instance_id}' not found", None
+        
+        # Execute the action; the lock keeps concurrent actions on the same
+        # instance from both passing the transition check, and makes the
+        # summary reflect this transition
+        with self._get_instance_lock(instance_id):
             success, message = instance.execute_action(action_id)
+            if not success:
+                return False, message, None
             
-            return success, message
-            
-        except Exception as e:
-            return False, f"Error executing action: {str(e)}"
+            return True, message, self._summary_json(instance_id, instance.version)
+    
+    def _get_instance_lock(self, instance_id: str) -> threading.Lock:
+        """Get the lock for an instance, creating it on first use."""
+        lock = self._instance_locks.get(instance_id)
+        if lock is None:
+            # setdefault is atomic, so racing callers still share one lock
+            lock = self._instance_locks.setdefault(instance_id, threading.Lock())
+        return lock
     
     # Utility Methods
     
-    def get_available_actions(self, instance_id: str) -> List[Action]:
+    def get_available_actions(self, instance: Union[str, WorkflowInstance]) -> List[Action]:
         """
         Get all actions that can be executed from the current state of an instance.
         
         Args:
-            instance_id: ID of the workflow instance
+            instance: ID of the workflow instance, or the instance itself
             
         Returns:
             List of executable actions
         """
-        instance = self.get_workflow_instance(instance_id)
-        if not instance or not instance.definition:
-            return []
+        if isinstance(instance, str):
+            instance = self.instances.get(instance)
+            if not instance:
+                return []
+        
+        return instance.get_available_actions()
+    
+    def get_available_actions_response_json(self, instance_id: str) -> Optional[bytes]:
+        """
+        Get the complete JSON success response listing an instance's available actions.
+        
+        Available actions depend only on the definition and the current
+        state, so the encoding is shared by every instance of a definition
+        in the same state and rebuilt only if the definition changes.
         
-        available_actions = []
-        for action in instance.definition.actions.values():
-            can_execute, _ = instance.can_execute_action(action.id)
-            if can_execute:
-                available_actions.append(action)
+        Args:
+            instance_id: ID of the workflow instance
+            
+        Returns:
+            JSON bytes of {"success": true, "data": [<action>, ...]} if the
+            instance exists, None otherwise
+        """
+        instance = self.instances.get(instance_id)
+        if not instance:
+            return None
+        if instance.is_in_final_state():
+            return _NO_ACTIONS_RESPONSE_JSON
         
-        return available_actions
+        # Encode the cached action dicts, as the instance summary does, so
+        # both responses list the actions the same way
+        actions = instance.get_available_action_dicts()
+        key = (instance.definition_id, instance.current_state_id)
+        cached = self._available_cache.get(key)
+        if cached is None or cached[0] != actions:
+            cached = (actions, self._encode_success_response(actions))
+            self._available_cache[key] = cached
+        return cached[1]
     
     def get_instance_summary(self, instance_id: str) -> Optional[dict]:
         """
@@ -229,16 +496,46 @@ class WorkflowService:
         Returns:
             Dictionary with instance summary or None if not found
         """
-        instance = self.get_workflow_instance(instance_id)
+        instance = self.instances.get(instance_id)
+        if not instance:
+            return None
+        
+        return self._build_instance_summary(instance)
+    
+    def get_instance_summary_json(self, instance_id: str) -> Optional[bytes]:
+        """
+        Get the JSON encoding of an instance summary.
+        
+        Encodings are kept in an LRU cache keyed by instance ID and version,
+        so repeated reads of an unchanged instance are not re-serialized.
+        
+        Args:
+            instance_id: ID of the workflow instance
+            
+        Returns:
+            JSON bytes if found, None otherwise
+        """
+        instance = self.instances.get(instance_id)
         if not instance:
             return None
+        return self._summary_json(instance_id, instance.version)
+    
+    def _encode_instance_summary(self, instance_id: str, version: int) -> bytes:
+        """Encode the summary of an instance; version only keys the cache."""
+        return dumps(self._build_instance_summary(self.instances[instance_id]))
+    
+    def _build_instance_summary(self, instance: WorkflowInstance) -> dict:
+        """
+        Build the summary dictionary for an already resolved instance.
         
+        The current state and available actions use the cached dictionaries
+        of the definition's models, so no per-request dicts are built for
+        them; the summary must not be modified.
+        """
         current_state = instance.get_current_state()
-        available_actions = self.get_available_actions(instance_id)
         
         return {
             'instance': instance.to_dict(),
             'current_state': current_state.to_dict() if current_state else None,
-            'available_actions': [action.to_dict() for action in available_actions]
+            'available_actions': instance.get_available_action_dicts()
         }
-